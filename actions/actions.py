@@ -1,3 +1,6 @@
+import numpy as np
+
+from pandas import Categorical, CategoricalDtype
 from pandas.core.frame import DataFrame
 from pandas._libs.tslibs.timestamps import Timestamp
 from typing import Dict, List
@@ -20,19 +23,29 @@ class Actions(DataFrame):
     Index is date of action.
 
     Columns:
-        ACTION: The action to take
-        INDICATOR_STRENGTH: The strength of the indicator. 1 represents a bullish sentiment, -1 represents a bearish sentiment.
+        ACTION: The action to take, stored as a categorical (int8 codes)
+        INDICATOR_STRENGTH: The strength of the indicator, stored as float32. 1 represents a bullish sentiment, -1 represents a bearish sentiment.
     """
 
     ACTION = 'ACTION'
     INDICATOR_STRENGTH = 'INDICATOR_STRENGTH'   
     COLUMNS = [ACTION, INDICATOR_STRENGTH]
 
+    ACTION_DTYPE = CategoricalDtype([ActionSimple.HOLD, ActionSimple.BUY, ActionSimple.SELL])
+    INDICATOR_STRENGTH_DTYPE = np.float32
+
     def __init__(self, index: List[Timestamp], data: Dict[str, List]):
         if (list(data.keys()) != self.COLUMNS):
             raise Exception(f'Invalid columns. Expected {self.COLUMNS} but received {list(data.keys())}')
 
-        super().__init__(index=index, data=data, columns=self.COLUMNS)
+        super().__init__(
+            index=index,
+            data={
+                self.ACTION: Categorical(data[self.ACTION], dtype=self.ACTION_DTYPE),
+                self.INDICATOR_STRENGTH: np.asarray(data[self.INDICATOR_STRENGTH], dtype=self.INDICATOR_STRENGTH_DTYPE)
+            },
+            columns=self.COLUMNS
+        )
 
 # TODO: to implement margins, you can add class Investment which has:
 #   @getValue(coin_value) which calculates how much value is invested with the given coin_price
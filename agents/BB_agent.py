@@ -1,4 +1,7 @@
+import numpy as np
+
 from agents.agent import Agent
+from numpy.lib.stride_tricks import sliding_window_view
 from pandas.core.frame import DataFrame
 from actions.actions import Actions, ActionSimple
 
@@ -31,28 +34,23 @@ class BB_agent(Agent):
         Returns:
             Actions: The actions to take
         """
-        bands = self._get_bollinger_bands(coin_data, window=self.bb_window, std=self.bb_std)
+        upper_band, lower_band, rolling_mean = self._get_bollinger_bands(coin_data, window=self.bb_window, std=self.bb_std)
 
         action_date = coin_data.index
-        actions = []
-        indicator_values = []
-        for i in range(0, len(coin_data)):
-            if i < self.bb_window:
-                actions.append(ActionSimple.HOLD)
-                indicator_values.append(0)
-                continue
-
-            action, indicator_strength = self._get_simple_action(coin_data.iloc[:i], bands.iloc[:i])
-            actions.append(action)
-            indicator_values.append(indicator_strength)
+        actions = np.full(len(coin_data), ActionSimple.HOLD, dtype=object)
+        indicator_values = np.zeros(len(coin_data), dtype=Actions.INDICATOR_STRENGTH_DTYPE)
+        # the action on bar i is decided on the bars i - 2 and i - 1
+        start = self.bb_window
+        actions[start:], indicator_values[start:] = self._get_simple_actions(
+            coin_data['Close'].to_numpy()[start - 2:-1],
+            upper_band[start - 2:-1],
+            lower_band[start - 2:-1],
+            rolling_mean[start - 2:-1]
+        )
 
         return Actions(index=action_date, data={Actions.ACTION: actions, Actions.INDICATOR_STRENGTH: indicator_values})
 
-    UPPER_BAND = 'upper_band'
-    LOWER_BAND = 'lower_band'
-    ROLLING_MEAN = 'rolling_mean'
-
-    def _get_bollinger_bands(self, coin_data: DataFrame, window: int=20, std: int=2) -> DataFrame:
+    def _get_bollinger_bands(self, coin_data: DataFrame, window: int=20, std: int=2) -> (np.ndarray, np.ndarray, np.ndarray):
         """
         Function calculates the bollinger bands.
 
@@ -62,54 +60,94 @@ class BB_agent(Agent):
             std (int): The number of standard deviations for the BB
 
         Returns:
-            DataFrame: The bollinger bands
+            np.ndarray: The upper band
+            np.ndarray: The lower band
+            np.ndarray: The rolling mean
         """
-        rolling_mean = coin_data['Close'].rolling(window=window).mean()
-        rolling_std = coin_data['Close'].rolling(window=window).std()
+        close = coin_data['Close'].to_numpy(dtype=np.float64)
+        rolling_mean = np.full(len(close), np.nan)
+        rolling_std = np.full(len(close), np.nan)
+        if len(close) >= window:
+            # running-sum identity: sum(close[i - window + 1:i + 1]) = csum[i + 1] - csum[i - window + 1]
+            # NaN closes are summed as 0 and counted, so like pandas only the windows containing one are NaN
+            missing = np.isnan(close)
+            csum = np.zeros(len(close) + 1)
+            np.cumsum(np.where(missing, 0.0, close), out=csum[1:])
+            missing_count = np.zeros(len(close) + 1, dtype=np.int64)
+            np.cumsum(missing, out=missing_count[1:])
+            rolling_mean[window - 1:] = np.where(
+                missing_count[window:] - missing_count[:-window] > 0,
+                np.nan,
+                (csum[window:] - csum[:-window]) / window
+            )
+
+            # zero-copy (N - window + 1, window) view, reduced along the window axis
+            windows = sliding_window_view(close, window)
+            deviations = windows - rolling_mean[window - 1:, np.newaxis]
+            rolling_std[window - 1:] = np.sqrt((deviations * deviations).sum(axis=1) / (window - 1))
+
+            # like pandas, a constant window has its value as mean and no std, rounding errors would leave a tiny band around the close
+            constant = np.ptp(windows, axis=1) == 0
+            rolling_mean[window - 1:][constant] = windows[constant, 0]
+            rolling_std[window - 1:][constant] = 0
 
         upper_band = rolling_mean + (rolling_std * std)
         lower_band = rolling_mean - (rolling_std * std)
 
-        return DataFrame(data={
-            self.UPPER_BAND: upper_band,
-            self.LOWER_BAND: lower_band,
-            self.ROLLING_MEAN: rolling_mean
-        })
+        return upper_band, lower_band, rolling_mean
 
-    def _get_simple_action(self, coin_data: DataFrame, bands: DataFrame) -> (ActionSimple, int):
+    def _get_simple_actions(
+        self,
+        close: np.ndarray,
+        upper_band: np.ndarray,
+        lower_band: np.ndarray,
+        rolling_mean: np.ndarray
+    ) -> (np.ndarray, np.ndarray):
         """
-        Function return instantaneous Bollinger bands strategy.
+        Function returns instantaneous Bollinger bands strategy for every bar.
         Buy when the price touches or falls below the lower BB and then rises back inside the bands.
         Sell when the price touches or exceeds the upper BB and then falls back inside the bands.
+        Crossings back inside the bands are found by comparing each bar with the previous one.
 
         Args:
-            coin_data (DataFrame): The coin data
-            bands (DataFrame): The bollinger bands
+            close (np.ndarray): The close prices
+            upper_band (np.ndarray): The upper band
+            lower_band (np.ndarray): The lower band
+            rolling_mean (np.ndarray): The rolling mean
 
         Returns:
-            ActionSimple: The action to take
-            int: The indicator strength
+            np.ndarray: The actions to take, one for each bar but the first
+            np.ndarray: The indicator strengths, one for each bar but the first
         """
-        action = ActionSimple.HOLD
+        previous_close, current_close = close[:-1], close[1:]
+        previous_upper, current_upper = upper_band[:-1], upper_band[1:]
+        previous_lower, current_lower = lower_band[:-1], lower_band[1:]
+        current_mean = rolling_mean[1:]
+
         # if price is inside the bands
-        if bands.iloc[-1][self.LOWER_BAND] < coin_data.iloc[-1]['Close'] < bands.iloc[-1][self.UPPER_BAND]:
-            # and it previously was above the upper band
-            if coin_data.iloc[-2]['Close'] > bands.iloc[-2][self.UPPER_BAND]:
-                # then sell
-                action = ActionSimple.SELL
-            # if it previously was below the lower band
-            elif coin_data.iloc[-2]['Close'] < bands.iloc[-2][self.LOWER_BAND]:
-                # then buy
-                action = ActionSimple.BUY
-            # calculate indicator strength
-            if coin_data.iloc[-1]['Close'] > bands.iloc[-1][self.ROLLING_MEAN]:
-                indicator_strength = -(coin_data.iloc[-1]['Close'] - bands.iloc[-1][self.ROLLING_MEAN]) / (bands.iloc[-1][self.UPPER_BAND] - bands.iloc[-1][self.ROLLING_MEAN]) 
-            else:
-                indicator_strength = (coin_data.iloc[-1]['Close'] - bands.iloc[-1][self.ROLLING_MEAN]) / (bands.iloc[-1][self.LOWER_BAND] - bands.iloc[-1][self.ROLLING_MEAN])
-        # if price is above the upper band
-        elif coin_data.iloc[-1]['Close'] >= bands.iloc[-1][self.UPPER_BAND]:
-            indicator_strength = -1
-        else:
-            indicator_strength = 1
-
-        return action, indicator_strength     
+        inside = (current_lower < current_close) & (current_close < current_upper)
+
+        actions = np.select(
+            [
+                # and it previously was above the upper band, then sell
+                inside & (previous_close > previous_upper),
+                # if it previously was below the lower band, then buy
+                inside & (previous_close < previous_lower)
+            ],
+            [ActionSimple.SELL, ActionSimple.BUY],
+            default=ActionSimple.HOLD
+        )
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside_strength = np.where(
+                current_close > current_mean,
+                -(current_close - current_mean) / (current_upper - current_mean),
+                (current_close - current_mean) / (current_lower - current_mean)
+            )
+        indicator_strength = np.select(
+            [inside, current_close >= current_upper],
+            [inside_strength, -1],
+            default=1
+        )
+
+        return actions, indicator_strength
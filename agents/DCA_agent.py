@@ -1,3 +1,5 @@
+import numpy as np
+
 from agents.agent import Agent
 from pandas.core.frame import DataFrame
 from actions.actions import Actions, ActionSimple, Investments
@@ -27,11 +29,10 @@ class DCA_agent(Agent):
             Actions: The actions to take
         """
         action_date = coin_data.index
-        actions = [ActionSimple.HOLD for _ in range(len(coin_data))]
-        indicator_values = [0 for _ in range(len(coin_data))]
-        for i in range(0, len(coin_data), self.investment_interval):
-            actions[i] = ActionSimple.BUY
-            indicator_values[i] = 1
+        actions = np.full(len(coin_data), ActionSimple.HOLD, dtype=object)
+        indicator_values = np.zeros(len(coin_data), dtype=Actions.INDICATOR_STRENGTH_DTYPE)
+        actions[::self.investment_interval] = ActionSimple.BUY
+        indicator_values[::self.investment_interval] = 1
 
         return Actions(
             index=action_date, 
@@ -51,34 +52,19 @@ class DCA_agent(Agent):
         Returns:
             Investments: The investments to make
         """
-        actions = self.act(coin_data)
-        portfolio_size = self.investment_amount * len(actions)
-
-        investments = None
-        for i in range(len(actions)):
-            if i == 0:
-                investments = Investments(
-                    index=[coin_data.index[0]],
-                    data={
-                        Investments.USD_AMOUNT_INVESTED: [portfolio_size - self.investment_amount],
-                        Investments.COIN_AMOUNT_INVESTED: [self.investment_amount / coin_data.loc[actions.index[0]]['Close']]
-                    }
-                )
-                continue
-            investments.buy_asset(actions.index[i], self.investment_amount, coin_data.loc[actions.index[i]]['Close'])
-        return investments
+        assert not coin_data.index.empty
 
+        close = coin_data['Close'].to_numpy()
+        portfolio_size = self.investment_amount * len(coin_data)
 
-        # actions = self.act(coin_data)
-        # total_invested = len(actions) * self.investment_amount
-        # usd_invested = [total_invested - self.investment_amount * i  for i in range(1, len(actions) + 1)]
-        # num_coins_bought = []
-        # for i in range(len(actions)):
-        #     # TODO: fix this
-        #     num_coins_bought.append(self.investment_amount / coin_data.loc[actions.index[i]]['Close'])
+        # investment_amount is invested on every bar: USD decreases linearly while the coins bought accumulate
+        usd_amount_invested = portfolio_size - self.investment_amount * np.arange(1, len(coin_data) + 1)
+        coin_amount_invested = np.cumsum(self.investment_amount / close)
 
-        # investments_data = {
-        #     Investments.USD_AMOUNT_INVESTED: usd_invested,
-        #     Investments.COIN_AMOUNT_INVESTED: num_coins_bought
-        # }
-        # return Investments(actions.index, investments_data)
+        return Investments(
+            index=coin_data.index,
+            data={
+                Investments.USD_AMOUNT_INVESTED: usd_amount_invested,
+                Investments.COIN_AMOUNT_INVESTED: coin_amount_invested
+            }
+        )
@@ -1,3 +1,5 @@
+import numpy as np
+
 from pandas import DataFrame
 from actions.actions import Actions, ActionSimple
 from agents.MACD_agent import MACD_agent
@@ -40,21 +42,16 @@ class MACD_RSI_agent(MACD_agent, RSI_agent):
         Returns:
             Actions: The actions to take
         """
-        macd = self._get_macd(coin_data, self.fast_period, self.slow_period, self.signal_period)
+        macd, signal = self._get_macd(coin_data, self.fast_period, self.slow_period, self.signal_period)
+        macd_diff = macd - signal
         rsi = self._get_rsi(coin_data, self.window)
 
         action_date = coin_data.index
-        actions = []
-        indicator_values = []
-        for i in range(len(coin_data)):
-            if i <= self.slow_period or i <= self.window:
-                actions.append(ActionSimple.HOLD)
-                indicator_values.append(0)
-                continue
-
-            action, indicator_strength = self._get_dmac_rsi_action(macd.iloc[:i], rsi.iloc[:i])
-            actions.append(action)
-            indicator_values.append(indicator_strength)
+        actions = np.full(len(coin_data), ActionSimple.HOLD, dtype=object)
+        indicator_values = np.zeros(len(coin_data), dtype=Actions.INDICATOR_STRENGTH_DTYPE)
+        # the warmup bars keep their HOLD/0 defaults
+        start = max(self.slow_period, self.window) + 1
+        actions[start:], indicator_values[start:] = self._get_dmac_rsi_actions(macd_diff[start - 2:-1], rsi[start - 1:-1])
 
         return Actions(
             index=action_date, 
@@ -64,27 +61,25 @@ class MACD_RSI_agent(MACD_agent, RSI_agent):
             }
         )
     
-    def _get_dmac_rsi_action(self, macd: DataFrame, rsi: DataFrame) -> ActionSimple:
+    def _get_dmac_rsi_actions(self, macd_diff: np.ndarray, rsi: np.ndarray) -> (np.ndarray, np.ndarray):
         """
-        Function calculates the action to take based on the MACD and RSI.
+        Function calculates the action to take on every bar based on the MACD and RSI.
 
         Args:
-            macd (DataFrame): The MACD
-            rsi (DataFrame): The RSI
+            macd_diff (np.ndarray): The MACD line minus the signal line, with one more bar than rsi at the start
+            rsi (np.ndarray): The RSI values
 
         Returns:
-            ActionSimple: The action to take
+            np.ndarray: The actions to take
+            np.ndarray: The indicator strengths
         """
-        macd_action, _ = MACD_agent._get_simple_action(self, macd)
-        rsi_action, rsi_strength = RSI_agent._get_simple_action(self, rsi)
+        macd_actions, _ = MACD_agent._get_simple_actions(self, macd_diff)
+        rsi_actions, rsi_strengths = RSI_agent._get_simple_actions(self, rsi)
 
-        action = ActionSimple.HOLD
-        indicator_strength = 0
-        if (macd_action == ActionSimple.BUY and rsi_strength > 0) or rsi_action == ActionSimple.BUY:
-            action = ActionSimple.BUY
-            indicator_strength = 1
-        elif rsi_action == ActionSimple.SELL:
-            action = ActionSimple.SELL
-            indicator_strength = -1
-        
-        return action, indicator_strength
+        buy = ((macd_actions == ActionSimple.BUY) & (rsi_strengths > 0)) | (rsi_actions == ActionSimple.BUY)
+        sell = ~buy & (rsi_actions == ActionSimple.SELL)
+
+        actions = np.select([buy, sell], [ActionSimple.BUY, ActionSimple.SELL], default=ActionSimple.HOLD)
+        indicator_strength = np.select([buy, sell], [1, -1], default=0)
+
+        return actions, indicator_strength
@@ -1,3 +1,5 @@
+import numpy as np
+
 from pandas import DataFrame
 from actions.actions import Actions, ActionSimple
 from agents.agent import Agent
@@ -36,20 +38,15 @@ class MACD_agent(Agent):
         Returns:
             Actions: The actions to take
         """
-        macd = self._get_macd(coin_data, self.fast_period, self.slow_period, self.signal_period)
+        macd, signal = self._get_macd(coin_data, self.fast_period, self.slow_period, self.signal_period)
+        macd_diff = macd - signal
 
         action_date = coin_data.index
-        actions = []
-        indicator_values = []
-        for i in range(len(coin_data)):
-            if i <= self.slow_period:
-                actions.append(ActionSimple.HOLD)
-                indicator_values.append(0)
-                continue
-
-            action, indicator_strength = self._get_simple_action(macd.iloc[:i])
-            actions.append(action)
-            indicator_values.append(indicator_strength)
+        actions = np.full(len(coin_data), ActionSimple.HOLD, dtype=object)
+        indicator_values = np.zeros(len(coin_data), dtype=Actions.INDICATOR_STRENGTH_DTYPE)
+        # the action on bar i is decided on the MACD of bars i - 2 and i - 1
+        start = self.slow_period + 1
+        actions[start:], indicator_values[start:] = self._get_simple_actions(macd_diff[start - 2:-1])
 
         return Actions(
             index=action_date, 
@@ -59,10 +56,7 @@ class MACD_agent(Agent):
             }
         )
 
-    MACD = 'macd'
-    SIGNAL = 'signal'
-
-    def _get_macd(self, coin_data: DataFrame, fast_period: int=12, slow_period: int=26, signal_period: int=9) -> DataFrame:
+    def _get_macd(self, coin_data: DataFrame, fast_period: int=12, slow_period: int=26, signal_period: int=9) -> (np.ndarray, np.ndarray):
         """
         Function calculates the MACD.
 
@@ -73,55 +67,40 @@ class MACD_agent(Agent):
             signal_period (int): The signal period for the MACD
 
         Returns:
-            DataFrame: The MACD
+            np.ndarray: The MACD line
+            np.ndarray: The signal line
         """
         macd = coin_data[coin_data.columns[0]].ewm(span=fast_period, adjust=False).mean() - \
             coin_data[coin_data.columns[0]].ewm(span=slow_period, adjust=False).mean()
         
         signal = macd.ewm(span=signal_period, adjust=False).mean()
 
-        return DataFrame({MACD_agent.MACD: macd, MACD_agent.SIGNAL: signal})
+        return macd.to_numpy(), signal.to_numpy()
 
-
-    def _get_simple_action(self, macd: DataFrame) -> (ActionSimple, int):
+    def _get_simple_actions(self, macd_diff: np.ndarray) -> (np.ndarray, np.ndarray):
         """
-        Function gets the action to take based on the MACD.
+        Function gets the action to take on every bar based on the MACD.
+        Buy when the MACD line crosses above the signal line, sell when it crosses below.
+        The crossovers are found by comparing each bar with the previous one.
 
         Args:
-            macd (DataFrame): The MACD
+            macd_diff (np.ndarray): The MACD line minus the signal line
 
         Returns:
-            ActionSimple: The action to take
-            int: The indicator strength
+            np.ndarray: The actions to take, one for each bar but the first
+            np.ndarray: The indicator strengths, one for each bar but the first
         """
-        action = ActionSimple.HOLD
-        indicator_strength = 0
-        # if macd line is above the signal
-        if macd.iloc[-1][MACD_agent.MACD] > macd.iloc[-1][MACD_agent.SIGNAL]:
-            indicator_strength = 1
-            # and it previously was not
-            if macd.iloc[-2][MACD_agent.MACD] < macd.iloc[-2][MACD_agent.SIGNAL]:
-                action = ActionSimple.BUY
-        # if macd line is below the signal
-        elif macd.iloc[-1][MACD_agent.MACD] < macd.iloc[-1][MACD_agent.SIGNAL]:
-            indicator_strength = -1
-            # and it previously was not
-            if macd.iloc[-2][MACD_agent.MACD] > macd.iloc[-2][MACD_agent.SIGNAL]:
-                action = ActionSimple.SELL
-        return action, indicator_strength
-    
-        # # if macd line is above signal line and it previously was not, buy
-        # if macd.iloc[-1][MACD_agent.MACD] > macd.iloc[-1][MACD_agent.SIGNAL] and macd.iloc[-2][MACD_agent.MACD] < macd.iloc[-2][MACD_agent.SIGNAL]:
-        #     return ActionSimple.BUY
-        # # if macd line is below signal line and it previously was not, sell
-        # elif macd.iloc[-1][MACD_agent.MACD] < macd.iloc[-1][MACD_agent.SIGNAL] and macd.iloc[-2][MACD_agent.MACD] > macd.iloc[-2][MACD_agent.SIGNAL]:
-        #     return ActionSimple.SELL
-        # else:
-        #     return ActionSimple.HOLD
-
-        # if macd.iloc[-1][MACD_agent.MACD] > macd.iloc[-1][MACD_agent.SIGNAL]:
-        #     return ActionSimple.BUY
-        # elif macd.iloc[-1][MACD_agent.MACD] < macd.iloc[-1][MACD_agent.SIGNAL]:
-        #     return ActionSimple.SELL
-        # else:
-        #     return ActionSimple.HOLD
+        previous = macd_diff[:-1]
+        current = macd_diff[1:]
+
+        above = current > 0
+        below = current < 0
+
+        actions = np.select(
+            [above & (previous < 0), below & (previous > 0)],
+            [ActionSimple.BUY, ActionSimple.SELL],
+            default=ActionSimple.HOLD
+        )
+        indicator_strength = np.select([above, below], [1, -1], default=0)
+
+        return actions, indicator_strength
@@ -1,3 +1,5 @@
+import numpy as np
+
 from pandas import DataFrame
 from actions.actions import Actions, ActionSimple
 from agents.agent import Agent
@@ -36,16 +38,11 @@ class RSI_agent(Agent):
         rsi = self._get_rsi(coin_data, self.window)
 
         action_date = coin_data.index
-        actions = []
-        indicator_values = []
-        for i in range(len(coin_data)):
-            if i <= self.window:
-                actions.append(ActionSimple.HOLD)
-                indicator_values.append(0)
-                continue
-            action, indicator_strength = self._get_simple_action(rsi.iloc[:i])
-            actions.append(action)
-            indicator_values.append(indicator_strength)
+        actions = np.full(len(coin_data), ActionSimple.HOLD, dtype=object)
+        indicator_values = np.zeros(len(coin_data), dtype=Actions.INDICATOR_STRENGTH_DTYPE)
+        # the action on bar i is decided on the RSI up to bar i - 1
+        start = self.window + 1
+        actions[start:], indicator_values[start:] = self._get_simple_actions(rsi[start - 1:-1])
 
         return Actions(
             index=action_date, 
@@ -55,9 +52,7 @@ class RSI_agent(Agent):
             }
         )
 
-    RSI = 'rsi'
-
-    def _get_rsi(self, coin_data: DataFrame, window: int=14) -> DataFrame:
+    def _get_rsi(self, coin_data: DataFrame, window: int=14) -> np.ndarray:
         """
         Function calculates the RSI.
 
@@ -66,7 +61,7 @@ class RSI_agent(Agent):
             window (int): The window size for the RSI
 
         Returns:
-            DataFrame: The RSI
+            np.ndarray: The RSI
         """
         delta = coin_data['Close'].diff()
         up = delta.clip(lower=0)
@@ -75,37 +70,36 @@ class RSI_agent(Agent):
         ema_down = down.ewm(com=window - 1, adjust=True, min_periods=window).mean()
         rs = ema_up / ema_down
         rsi = 100 - (100 / (1 + rs))
-        return DataFrame(data={
-            self.RSI: rsi
-        })
+        return rsi.to_numpy()
 
-    def _get_simple_action(self, rsi: DataFrame) -> (ActionSimple, int):
+    _ACTION_CODES = np.array([ActionSimple.HOLD, ActionSimple.BUY, ActionSimple.SELL], dtype=object)
+
+    def _get_simple_actions(self, rsi: np.ndarray) -> (np.ndarray, np.ndarray):
         """
-        Function returns the simple action based on the RSI.
+        Function returns the simple action for every RSI value.
+        Sell above the overbought threshold, buy below the oversold threshold, otherwise hold.
+        Actions are classified into codes without branching and mapped back through a lookup table.
 
         Args:
-            rsi (DataFrame): The RSI
+            rsi (np.ndarray): The RSI values
 
         Returns:
-            ActionSimple: The action to take
-            int: The indicator strength            
+            np.ndarray: The actions to take
+            np.ndarray: The indicator strengths
         """
-        action = ActionSimple.HOLD
-        indicator_strength = 0
-        
-        # if rsi line is above overbought threshold
-        if rsi.iloc[-1][self.RSI] > self.overbought:
-            action = ActionSimple.SELL
-            indicator_strength = -1
-        # if its below oversold threshold
-        elif rsi.iloc[-1][self.RSI] < self.oversold:
-            action = ActionSimple.BUY
-            indicator_strength = 1
-        else:
-            action = ActionSimple.HOLD
-            # calculate indicator strength based on how far away from the threshold it is
-            if rsi.iloc[-1][self.RSI] > 50:
-                indicator_strength = -(rsi.iloc[-1][self.RSI] - 50) / (self.overbought - 50)
-            else:
-                indicator_strength = (rsi.iloc[-1][self.RSI] - 50) / (self.oversold - 50)
-        return action, indicator_strength
+        overbought = rsi > self.overbought
+        oversold = rsi < self.oversold
+
+        # 0: HOLD, 1: BUY, 2: SELL
+        codes = np.where(overbought, 2, np.where(oversold, 1, 0))
+        actions = self._ACTION_CODES[codes]
+
+        # strength based on how far away from the threshold the RSI is
+        neutral_strength = np.where(
+            rsi > 50,
+            -(rsi - 50) / (self.overbought - 50),
+            (rsi - 50) / (self.oversold - 50)
+        )
+        indicator_strength = np.where(overbought, -1, np.where(oversold, 1, neutral_strength))
+
+        return actions, indicator_strength
@@ -1,8 +1,10 @@
+import numpy as np
+
 from agents.investors.investor import Investor
-from actions.actions import ActionSimple, Actions, Investments
+from actions.actions import ActionSimple, Actions, Investments, tolerance
+from math import isclose
 from pandas.core.frame import DataFrame
 from pandas._libs.tslibs.timestamps import Timestamp
-from typing import List
 
 # TODO: test
 # TODO: selling strategy where you sell depending on the average increase in price over the previous buys.
@@ -17,25 +19,52 @@ class SimpleStopLossInvestor(Investor):
     Sell a fixed allocation of the current portfolio size in each SELL investment (assets_allocation * current_assets_owned).
     """
 
-    class Buys(DataFrame):
+    class Buys():
         """
         Class represents a list of buys.
         Index is date of buy.
 
-        For each buy, store the amount of USD invested, the asset price, and the (remaining) amount of coins acquired.
+        For each buy, store the amount of USD invested, the asset price, the stop-loss price, and the (remaining) amount of coins acquired.
+        Columns are kept in preallocated numpy buffers that double in capacity when full.
+        Buys are kept sorted by stop-loss price, so the buys hit by a stop-loss are always the last ones.
 
         Each sell should update the amount of coins acquired.
         A stop-loss should sell all remaining coins acquired in the transaction.
         """
         USD_AMOUNT_INVESTED = 'USD_AMOUNT_INVESTED'
         INITIAL_ASSET_PRICE = 'INITIAL_ASSET_PRICE'
+        STOP_LOSS_PRICE = 'STOP_LOSS_PRICE'
         REMAINING_COIN_AMOUNT = 'REMAINING_COIN_AMOUNT'
-        COLUMNS = [USD_AMOUNT_INVESTED, INITIAL_ASSET_PRICE, REMAINING_COIN_AMOUNT]
+        COLUMNS = [USD_AMOUNT_INVESTED, INITIAL_ASSET_PRICE, STOP_LOSS_PRICE, REMAINING_COIN_AMOUNT]
 
-        def __init__(self):
-            super().__init__(index=[], data={}, columns=self.COLUMNS)
+        def __init__(self, capacity: int = 64):
+            """
+            Args:
+                capacity (int): The initial number of buys the buffers can hold
+            """
+            self._size = 0
+            # running sum of the remaining coins of all buys
+            self._total_coin_amount = 0.0
+            self._dates = np.empty(capacity, dtype=object)
+            self._columns = {column: np.empty(capacity, dtype=np.float64) for column in self.COLUMNS}
 
-        def add_buy(self, date: Timestamp, usd_amount: float, asset_price: float):
+        def __len__(self) -> int:
+            return self._size
+
+        def __getitem__(self, column: str) -> np.ndarray:
+            """
+            Method returns a view of the given column over the open buys.
+            """
+            return self._columns[column][:self._size]
+
+        @property
+        def index(self) -> np.ndarray:
+            """
+            The dates of the open buys.
+            """
+            return self._dates[:self._size]
+
+        def add_buy(self, date: Timestamp, usd_amount: float, asset_price: float, stop_loss: float):
             """
             Method to add a buy.
 
@@ -43,8 +72,27 @@ class SimpleStopLossInvestor(Investor):
                 date (Timestamp): The date of the investment
                 usd_amount (float): The amount of USD invested
                 asset_price (float): The price of the asset at the time of investment
+                stop_loss (float): The stop loss percentage
             """
-            self.loc[date] = [usd_amount, asset_price, usd_amount / asset_price]
+            if self._size == len(self._dates):
+                self._grow()
+
+            stop_loss_price = asset_price * (1 - stop_loss)
+
+            # insert after the buys with a lower or equal stop-loss price
+            size = self._size
+            i = np.searchsorted(self._columns[self.STOP_LOSS_PRICE][:size], stop_loss_price, side='right')
+            self._dates[i + 1:size + 1] = self._dates[i:size]
+            for values in self._columns.values():
+                values[i + 1:size + 1] = values[i:size]
+
+            self._dates[i] = date
+            self._columns[self.USD_AMOUNT_INVESTED][i] = usd_amount
+            self._columns[self.INITIAL_ASSET_PRICE][i] = asset_price
+            self._columns[self.STOP_LOSS_PRICE][i] = stop_loss_price
+            self._columns[self.REMAINING_COIN_AMOUNT][i] = usd_amount / asset_price
+            self._total_coin_amount += usd_amount / asset_price
+            self._size += 1
 
         def sell(self, coin_percentage: float) -> float:
             """
@@ -58,29 +106,114 @@ class SimpleStopLossInvestor(Investor):
             """
             assert 0 <= coin_percentage <= 1
 
-            coins_sold = (self[self.REMAINING_COIN_AMOUNT] * coin_percentage).sum()
-            self[self.REMAINING_COIN_AMOUNT] -= self[self.REMAINING_COIN_AMOUNT] * coin_percentage
+            # every buy sells the same percentage, so the coins sold follow from the running total
+            coins_sold = self._total_coin_amount * coin_percentage
+            remaining_coin_amount = self[self.REMAINING_COIN_AMOUNT]
+            remaining_coin_amount *= 1 - coin_percentage
+            self._total_coin_amount -= coins_sold
 
             return coins_sold
 
 
-        def stop_loss(self, date: Timestamp) -> float:
+        def highest_stop_loss_price(self) -> float:
+            """
+            Method returns the highest stop-loss price of the open buys, any price below it triggers a stop-loss.
+            It is the stop-loss price of the last buy.
+
+            Returns:
+                float: The highest stop-loss price
+            """
+            assert self._size > 0
+
+            return self._columns[self.STOP_LOSS_PRICE][self._size - 1]
+
+        def stop_loss(self, current_asset_price: float) -> float:
             """
-            Method to sell all coins acquired in the transaction at the given date.
+            Method to sell all remaining coins of the buys whose stop-loss price is above the current asset price.
 
             Args:
-                date (Timestamp): The date of the investment
+                current_asset_price (float): The current asset price
 
             Returns:
                 float: The amount of coins sold
             """
-            assert date in self.index
+            size = self._size
+            # the triggered buys are the suffix past the current price
+            first = np.searchsorted(self._columns[self.STOP_LOSS_PRICE][:size], current_asset_price, side='right')
 
-            coin_amount = self.loc[date][self.REMAINING_COIN_AMOUNT]
-            self.drop(date, inplace=True)
+            coin_amount = self._columns[self.REMAINING_COIN_AMOUNT][first:size].sum()
+            self._dates[first:size] = None
+            self._size = first
+            # reset once empty so rounding errors do not build up
+            self._total_coin_amount = self._total_coin_amount - coin_amount if first else 0.0
 
             return coin_amount
 
+        def _grow(self):
+            """
+            Method doubles the capacity of the buffers.
+            """
+            capacity = 2 * max(len(self._dates), 1)
+
+            dates = np.empty(capacity, dtype=object)
+            dates[:self._size] = self._dates[:self._size]
+            self._dates = dates
+
+            for column, values in self._columns.items():
+                grown = np.empty(capacity, dtype=np.float64)
+                grown[:self._size] = values[:self._size]
+                self._columns[column] = grown
+
+
+    class _InvestmentRows():
+        """
+        Class buffers the investments by date, so Investments is built once with @to_investments instead of a row at a time.
+        A later trade on the same date replaces the recorded amounts.
+        """
+
+        def __init__(self, date: Timestamp, usd_amount_invested: float):
+            """
+            Args:
+                date (Timestamp): The start date
+                usd_amount_invested (float): The amount of USD invested at the start date
+            """
+            self.usd_amount_invested = usd_amount_invested
+            self.coin_amount_invested = 0
+            self._rows = {date: (usd_amount_invested, 0)}
+
+        def record_trade(self, date: Timestamp, usd_amount: float, coin_amount: float):
+            """
+            Method applies a trade to the invested amounts, validates them and records them at the given date.
+            A buy pays USD for coins (negative usd_amount, positive coin_amount), a sell the other way around.
+
+            Args:
+                date (Timestamp): The date of the trade
+                usd_amount (float): The amount of USD received, negative when paid
+                coin_amount (float): The amount of coins received, negative when sold
+            """
+            self.usd_amount_invested += usd_amount
+            self.coin_amount_invested += coin_amount
+
+            assert self.usd_amount_invested >= 0 or isclose(self.usd_amount_invested, 0, abs_tol=tolerance)
+            assert self.coin_amount_invested >= 0 or isclose(self.coin_amount_invested, 0, abs_tol=tolerance)
+
+            self._rows[date] = (self.usd_amount_invested, self.coin_amount_invested)
+
+        def to_investments(self) -> Investments:
+            """
+            Method returns the recorded investments.
+
+            Returns:
+                Investments: The investments, one row per date
+            """
+            return Investments(
+                index=list(self._rows.keys()),
+                data={
+                    Investments.USD_AMOUNT_INVESTED: [usd for usd, _ in self._rows.values()],
+                    Investments.COIN_AMOUNT_INVESTED: [coin for _, coin in self._rows.values()]
+                }
+            )
+
 
     def __init__(
         self, 
@@ -115,65 +248,61 @@ class SimpleStopLossInvestor(Investor):
         assert not coin_data.index.empty
 
         buys = self.Buys()
-        # TODO: init with start date, portfolio size
-        investments = Investments(
-            index=[coin_data.index[0]], 
-            data={
-                Investments.USD_AMOUNT_INVESTED: [self.portfolio_size],
-                Investments.COIN_AMOUNT_INVESTED: [0]
-            }
-        )
-
-        for i in range(len(coin_data)):
-            # check stop-loss
-            stop_loss_transactions = self._check_stop_loss(buys, coin_data.iloc[i]['Close'], self.stop_loss)
-            if stop_loss_transactions:
-                coins_sold = 0
-                for date in stop_loss_transactions:
-                    coins_sold += buys.stop_loss(date)
-
-                investments.sell_asset(coin_data.index[i], coins_sold, coin_data.iloc[i]['Close'])
-                self.portfolio_size = investments.get_usd_amount_invested()
-
-            # check date is in actions
-            date = coin_data.index[i]
-            if date not in actions.index:
-                continue
+        investments = self._InvestmentRows(coin_data.index[0], self.portfolio_size)
+
+        # align the actions to the bars once as their int8 category codes, bars without an action get -1
+        bar_actions = actions[Actions.ACTION].reindex(coin_data.index).cat.codes.to_numpy()
+
+        dates = coin_data.index
+        close = coin_data['Close'].to_numpy()
+
+        # bind loop invariants to locals
+        stop_loss = self.stop_loss
+        portfolio_allocation = self.portfolio_allocation
+        assets_allocation = self.assets_allocation
+        record_trade = investments.record_trade
+        BUY = Actions.ACTION_DTYPE.categories.get_loc(ActionSimple.BUY)
+        SELL = Actions.ACTION_DTYPE.categories.get_loc(ActionSimple.SELL)
+
+        # only the BUY and SELL bars need a visit, the bars in between can only trigger stop-losses
+        action_bars = np.flatnonzero((bar_actions == BUY) | (bar_actions == SELL))
+        bar = 0
+        for action_bar in [*action_bars, len(coin_data)]:
+            # check stop-loss on the bars up to and including the action bar
+            while len(buys):
+                hits = np.flatnonzero(close[bar:action_bar + 1] < buys.highest_stop_loss_price())
+                if not len(hits):
+                    break
+
+                # every stop-loss above the price is triggered, the remaining buys cannot trigger on this bar again
+                bar += hits[0]
+                asset_price = close[bar]
+                coins_sold = buys.stop_loss(asset_price)
+
+                record_trade(dates[bar], coins_sold * asset_price, -coins_sold)
+                bar += 1
+
+            if action_bar == len(coin_data):
+                break
+
+            date = dates[action_bar]
+            asset_price = close[action_bar]
 
             # TODO: update portfolio size
-            if actions.loc[date][Actions.ACTION] == ActionSimple.BUY:
-                usd_amount = self.portfolio_allocation * self.portfolio_size
+            if bar_actions[action_bar] == BUY:
+                usd_amount = portfolio_allocation * investments.usd_amount_invested
                 # self.portfolio_size -= usd_amount
-                
-                asset_price = coin_data.iloc[i]['Close']
-
-                buys.add_buy(coin_data.index[i], usd_amount, asset_price)
-                investments.buy_asset(coin_data.index[i], usd_amount, asset_price)
-            elif actions.loc[date][Actions.ACTION] == ActionSimple.SELL:
-                coins_sold = buys.sell(self.assets_allocation)
-                asset_price = coin_data.iloc[i]['Close']
-
-                investments.sell_asset(coin_data.index[i], coins_sold, asset_price)
-            
-            self.portfolio_size = investments.get_usd_amount_invested()
 
-        return investments
+                buys.add_buy(date, usd_amount, asset_price, stop_loss)
+                usd_amount, coin_amount = -usd_amount, usd_amount / asset_price
+            else:
+                coins_sold = buys.sell(assets_allocation)
+                usd_amount, coin_amount = coins_sold * asset_price, -coins_sold
 
-    def _check_stop_loss(self, buys: Buys, current_asset_price: float, stop_loss: float) -> List[Timestamp]:
-        """
-        Method to check if the stop-loss has been triggered for any of the previous buys.  
-
-        Args:
-            buys (Buys): The buys
-            current_asset_price (float): The current asset price
-            stop_loss (float): The stop loss percentage
+            record_trade(date, usd_amount, coin_amount)
+            bar = action_bar + 1
 
-        Returns:
-            List[Timestamp]: The dates of the stop-losses
-        """
-        stop_loss_dates = []
-        for date in buys.index:
-            if buys.loc[date][self.Buys.INITIAL_ASSET_PRICE] * (1 - stop_loss) > current_asset_price:
-                stop_loss_dates.append(date)
+        # buys are sized on the running USD balance, the portfolio size is refreshed once at the end
+        self.portfolio_size = investments.usd_amount_invested
 
-        return stop_loss_dates
+        return investments.to_investments()
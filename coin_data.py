@@ -1,11 +1,30 @@
-import matplotlib.pyplot as plt
 import ccxt
+import numpy as np
 import pandas as pd
 
 from pandas.core.frame import DataFrame
 from actions.actions import Actions, ActionSimple, Investments
 
 
+# binance exchange with its markets loaded, shared by all calls to @get_coin_data
+_exchange = None
+
+
+def _get_exchange() -> ccxt.binance:
+    """
+    Get the binance exchange, its markets are loaded on the first call only.
+
+    Returns:
+        ccxt.binance: The exchange
+    """
+    global _exchange
+    if _exchange is None:
+        exchange = ccxt.binance()
+        exchange.load_markets()
+        _exchange = exchange
+    return _exchange
+
+
 def get_coin_data(coin: str, timestamp: str) -> DataFrame:
     """
     Get the coin data from binance exchange.
@@ -17,9 +36,7 @@ def get_coin_data(coin: str, timestamp: str) -> DataFrame:
     Returns:
         DataFrame: The coin data
     """
-    exchange = ccxt.binance()
-
-    exchange.load_markets()
+    exchange = _get_exchange()
 
     # {'1s', '1m', '3m','5m', '15m','30m','1h','2h','4h',6h',8h,'12h',1d', '3d', '1w', '1M'}
     # print(exchange.timeframes)
@@ -40,10 +57,50 @@ def get_coin_data(coin: str, timestamp: str) -> DataFrame:
     #     since='int [since]: timestamp in ms of the earliest candle to fetch',
     #     params=params
     # )
-    df = pd.DataFrame(data, columns=['timestamp', 'open', 'high', 'low', 'Close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    return df
+    # rows are [timestamp (ms), open, high, low, close, volume]
+    ohlcv = np.asarray(data, dtype=np.float64).reshape(-1, 6)
+    index = pd.DatetimeIndex(ohlcv[:, 0].astype(np.int64).astype('datetime64[ms]').astype('datetime64[ns]'), name='timestamp')
+
+    return pd.DataFrame(ohlcv[:, 1:], index=index, columns=['open', 'high', 'low', 'Close', 'volume'])
+
+
+def _is_interactive_backend() -> bool:
+    """
+    Function checks with matplotlib whether the current backend can display figures.
+    module:// backends (ie: the Jupyter inline backend) are third party and display through their own show.
+
+    Returns:
+        bool: True if plt.show() can display the figures
+    """
+    import matplotlib
+
+    backend = matplotlib.get_backend()
+    if backend.startswith('module://'):
+        return True
+
+    try:
+        from matplotlib.backends import BackendFilter, backend_registry
+        interactive_backends = backend_registry.list_builtin(BackendFilter.INTERACTIVE)
+    except ImportError:
+        # matplotlib < 3.9
+        interactive_backends = matplotlib.rcsetup.interactive_bk
+
+    return backend.lower() in {name.lower() for name in interactive_backends}
+
+
+def _show(fig) -> None:
+    """
+    Function shows the figure, on non-interactive backends (ie: Agg under CI) it is closed instead so repeated plots do not leak figures.
+
+    Args:
+        fig (Figure): The figure to show
+    """
+    import matplotlib.pyplot as plt
+
+    if _is_interactive_backend():
+        plt.show()
+    else:
+        plt.close(fig)
 
 
 def plot_actions(coin_data: DataFrame, actions: Actions, coin: str) -> None:
@@ -55,23 +112,31 @@ def plot_actions(coin_data: DataFrame, actions: Actions, coin: str) -> None:
         actions (DataFrame): The actions to plot
         coin (str): The coin to plot
     """
-    plt.figure(figsize=(20, 10))
+    # imported here so fetching data does not pay for loading matplotlib
+    import matplotlib.pyplot as plt
+
+    close = coin_data['Close'].to_numpy()
+
+    fig = plt.figure(figsize=(20, 10))
     plt.title(f'{coin} price with actions')
     plt.xlabel('Date')
     plt.ylabel('Price (USD)')
     
-    plt.plot(coin_data.index, coin_data['Close'], label=f'{coin} price', color='black')
+    # the price line has a point per bar, rasterize it so vector exports stay small, the markers stay vectors
+    plt.plot(coin_data.index, close, label=f'{coin} price', color='black', rasterized=True)
     
     # TODO: have integer deciding the strength of the action
     # plot strength as transparency/alpha
-    buys = actions[actions[Actions.ACTION] == ActionSimple.BUY]
-    sells = actions[actions[Actions.ACTION] == ActionSimple.SELL]
+    # align the actions to the bars once as their int8 category codes, then take the buy and sell positions
+    bar_actions = actions[Actions.ACTION].reindex(coin_data.index).cat.codes.to_numpy()
+    buys = np.flatnonzero(bar_actions == Actions.ACTION_DTYPE.categories.get_loc(ActionSimple.BUY))
+    sells = np.flatnonzero(bar_actions == Actions.ACTION_DTYPE.categories.get_loc(ActionSimple.SELL))
 
-    plt.scatter(buys.index, coin_data.loc[buys.index]['Close'], label="Buy's", marker='^', color='green', s=80)
-    plt.scatter(sells.index, coin_data.loc[sells.index]['Close'], label="Sell's", marker='v', color='red', s=80)
+    plt.scatter(coin_data.index[buys], close[buys], label="Buy's", marker='^', color='green', s=80)
+    plt.scatter(coin_data.index[sells], close[sells], label="Sell's", marker='v', color='red', s=80)
     plt.grid(True)
     plt.legend()
-    plt.show()
+    _show(fig)
 
 def plot_profit(coin_data: DataFrame, investments: Investments, coin: str, agent_name: str) -> None:
     """
@@ -86,80 +151,57 @@ def plot_profit(coin_data: DataFrame, investments: Investments, coin: str, agent
         coin (str): The coin to plot
         agent_name (str): The name of the agent
     """
-    plt.figure(figsize=(20, 10))
-    plt.title(f'{coin} profit with {agent_name} investments')
-    plt.xlabel('Date')
-    plt.ylabel('Value (USD)')
+    # imported here so fetching data does not pay for loading matplotlib
+    import matplotlib.pyplot as plt
 
-    # plot value of invested USD
-    total_value = []
-    usd_value = []
-    coins_value = []
+    close = coin_data['Close'].to_numpy()
+
+    # the three plots share one figure and the date axis
+    fig, (value_ax, ratio_ax, change_ax) = plt.subplots(3, 1, figsize=(20, 30), sharex=True)
 
-    usd_invested = 0
-    coins_invested = 0
-    for i in range(len(coin_data)):
-        if coin_data.index[i] in investments.index:
-            usd_invested = investments.loc[coin_data.index[i]][Investments.USD_AMOUNT_INVESTED]
-            coins_invested = investments.loc[coin_data.index[i]][Investments.COIN_AMOUNT_INVESTED]
+    # plot value of invested USD
+    value_ax.set_title(f'{coin} profit with {agent_name} investments')
+    value_ax.set_xlabel('Date')
+    value_ax.set_ylabel('Value (USD)')
 
-        usd_value.append(usd_invested)
-        coins_value.append(coins_invested * coin_data.loc[coin_data.index[i]]['Close'])
+    # each bar holds the amounts of the latest investment up to it, nothing is invested before the first one
+    invested = investments.reindex(coin_data.index).ffill().fillna(0)
 
-        total_value.append(usd_value[i] + coins_value[i])
+    usd_value = invested[Investments.USD_AMOUNT_INVESTED].to_numpy()
+    coins_value = invested[Investments.COIN_AMOUNT_INVESTED].to_numpy() * close
+    total_value = usd_value + coins_value
     
-    plt.plot(coin_data.index, total_value, label='Total value', color='black')
-    plt.grid(True)
-    plt.legend()
-    plt.show()
+    value_ax.plot(coin_data.index, total_value, label='Total value', color='black')
+    value_ax.grid(True)
+    value_ax.legend()
 
     # plot percentage of portfolio in USD and coins
-    plt.figure(figsize=(20, 10))
-    plt.title(f'Percentage of portfolio in USD and {coin} value')
-    plt.xlabel('Date')
-    plt.ylabel('Percentage of portfolio')
+    ratio_ax.set_title(f'Percentage of portfolio in USD and {coin} value')
+    ratio_ax.set_xlabel('Date')
+    ratio_ax.set_ylabel('Percentage of portfolio')
 
     # plot usd_value / total_value with background color green below the plot line, and red above
-    ratio = [usd_value[i] / total_value[i] for i in range(len(total_value))]
-
-    plt.plot(coin_data.index, ratio, label='USD value portfolio percentage', color='black')
-    plt.fill_between(
-        coin_data.index,
-        ratio,
-        [1 for _ in range(len(ratio))],
-        interpolate=True,
-        color='red',
-        alpha=0.5
-    )
-    plt.fill_between(
-        coin_data.index,
-        ratio,
-        [0 for _ in range(len(ratio))],
-        interpolate=True,
-        color='green',
-        alpha=0.5
-    )
-    plt.grid(True)
-    plt.legend()
-    plt.show()
+    # bars with nothing invested have no portfolio to split, leave them at 0
+    ratio = np.divide(usd_value, total_value, out=np.zeros(len(total_value)), where=total_value != 0)
+
+    ratio_ax.plot(coin_data.index, ratio, label='USD value portfolio percentage', color='black')
+    ratio_ax.fill_between(coin_data.index, ratio, 1, color='red', alpha=0.5)
+    ratio_ax.fill_between(coin_data.index, 0, ratio, color='green', alpha=0.5)
+    ratio_ax.grid(True)
+    ratio_ax.legend()
 
     # plot profit and coin crease over time
-    plt.figure(figsize=(20, 10))
-    plt.title(f'Profit and {coin} value over time')
-    plt.xlabel('Date')
-    plt.ylabel('Change %')
+    change_ax.set_title(f'Profit and {coin} value over time')
+    change_ax.set_xlabel('Date')
+    change_ax.set_ylabel('Change %')
 
-    coin_diff_percentage = []
-    for i in range(len(coin_data)):
-        coin_diff_percentage.append((coin_data.iloc[i]['Close'] - coin_data.iloc[0]['Close']) / coin_data.iloc[0]['Close'])
+    coin_diff_percentage = (close - close[0]) / close[0]
 
-    plt.plot(coin_data.index, coin_diff_percentage, label=f'{coin} value change', color='black')
+    change_ax.plot(coin_data.index, coin_diff_percentage, label=f'{coin} value change', color='black', rasterized=True)
 
-    profit = []
-    for i in range(len(total_value)):
-        profit.append((total_value[i] - total_value[0]) / total_value[0])
+    profit = (total_value - total_value[0]) / total_value[0]
     
-    plt.plot(coin_data.index, profit, label='Profit', color='blue')
-    plt.grid(True)
-    plt.legend()
-    plt.show()
+    change_ax.plot(coin_data.index, profit, label='Profit', color='blue')
+    change_ax.grid(True)
+    change_ax.legend()
+    _show(fig)
\ No newline at end of file